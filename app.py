@@ -5,6 +5,11 @@ from datetime import datetime, timedelta
 import os
 import requests
 import calendar
+import cycle_index
+import hashing
+import profiling
+import read_models
+import streaming
 from config import Config
 from models import db, User, UserSettings, Period, Product, ProductHistory, Medication, MedicationHistory
 
@@ -14,6 +19,18 @@ app.config.from_object(Config)
 # Initialize SQLAlchemy
 db.init_app(app)
 
+# Password hashing pool
+hashing.init_app(app)
+
+# Opt-in request profiling
+profiling.init_app(app)
+
+# Calendar marker index
+cycle_index.init_app(app)
+
+# Response compression
+streaming.init_app(app)
+
 # Create tables
 with app.app_context():
     db.create_all()
@@ -34,9 +51,9 @@ def get_user_data():
     return None
 
 def calculate_cycle_stats(user_id):
-    periods = Period.query.filter_by(user_id=user_id).order_by(Period.start_date.desc()).all()
+    period_starts = read_models.period_start_dates(user_id)
     
-    if len(periods) < 1:
+    if len(period_starts) < 1:
         return {
             'average_length': 28,
             'last_period': None,
@@ -47,20 +64,10 @@ def calculate_cycle_stats(user_id):
             'days_until_ovulation': None
         }
     
-    last_period = periods[0].start_date
+    last_period = period_starts[0]
     current_day = (datetime.now().date() - last_period).days + 1
     
-    if len(periods) < 2:
-        avg_length = 28
-    else:
-        cycle_lengths = []
-        for i in range(len(periods) - 1):
-            start_current = periods[i].start_date
-            start_previous = periods[i+1].start_date
-            cycle_length = (start_current - start_previous).days
-            cycle_lengths.append(cycle_length)
-        
-        avg_length = sum(cycle_lengths) // len(cycle_lengths) if cycle_lengths else 28
+    avg_length = cycle_index.average_cycle_length(period_starts)
     
     next_period = last_period + timedelta(days=avg_length)
     ovulation_day = next_period - timedelta(days=14)
@@ -136,6 +143,12 @@ def inject_user_settings():
         'passcode_lock': False
     })
 
+@app.errorhandler(hashing.HashPoolSaturated)
+def hash_pool_saturated(e):
+    flash('The server is busy right now. Please try again in a moment.', 'danger')
+    template = 'register.html' if request.endpoint == 'register' else 'login.html'
+    return render_template(template), 503, {'Retry-After': '1'}
+
 # Routes
 @app.route('/')
 def index():
@@ -191,6 +204,15 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if user and user.check_password(password):
+            # Upgrade the stored hash if the configured cost has changed. If the
+            # pool is busy the upgrade is simply retried on the next login.
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except hashing.HashPoolSaturated:
+                    pass
+            
             session['user_id'] = user.id
             flash('Logged in successfully!', 'success')
             return redirect(url_for('dashboard'))
@@ -227,37 +249,18 @@ def dashboard():
     first_day_of_month = today.replace(day=1)
     start_day_offset = (first_day_of_month.weekday() + 1) % 7 
     days_in_month = calendar.monthrange(today.year, today.month)[1]
+    # The month view is built from fresh period rows rather than the cached
+    # index, so it always agrees with cycle_stats on the same page
+    month_markers = cycle_index.build_index(user.id, history=False).markers(
+        first_day_of_month.date(),
+        first_day_of_month.date().replace(day=days_in_month)
+    )
 
-    # Get upcoming medications
-    upcoming_meds = Medication.query.filter(
-        Medication.user_id == user.id,
-        Medication.next_dose >= now - timedelta(minutes=30)
-    ).order_by(Medication.next_dose).limit(3).all()
-    
-    # Format medication times
-    for med in upcoming_meds:
-        time_diff = med.next_dose - now
-        if time_diff.total_seconds() < 0:
-            med.time_until = "Due now"
-        else:
-            hours, remainder = divmod(time_diff.seconds, 3600)
-            minutes, _ = divmod(remainder, 60)
-            med.time_until = f"{hours} hours {minutes} minutes"
+    # Get upcoming medications with formatted times
+    upcoming_meds = read_models.upcoming_medication_rows(user.id, now)
     
     # Get supplies with stock status
-    supplies = Product.query.filter_by(user_id=user.id).all()
-    for supply in supplies:
-        initial_qty = supply.initial_quantity if supply.initial_quantity > 0 else 1
-        
-        if supply.quantity <= 0:
-            supply.status = 'Out of Stock'
-            supply.status_class = 'status-error'
-        elif supply.quantity < (initial_qty * 0.25):
-            supply.status = 'Running Low'
-            supply.status_class = 'status-warning'
-        else:
-            supply.status = 'Stocked'
-            supply.status_class = 'status-success'
+    supplies = read_models.product_rows(user.id)
             
     # Get settings
     user_settings = {
@@ -278,9 +281,47 @@ def dashboard():
                            today=today,
                            month_calendar_data={
                                'start_day_offset': start_day_offset,
-                               'days_in_month': days_in_month
+                               'days_in_month': days_in_month,
+                               'markers': {day.day: markers for day, markers in month_markers.items()}
                            })
 
+@app.route('/api/calendar')
+@login_required
+def calendar_markers():
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(request.args.get('start', today.strftime('%Y-%m')), '%Y-%m').date()
+        end = datetime.strptime(request.args.get('end', start.strftime('%Y-%m')), '%Y-%m').date()
+    except ValueError:
+        return jsonify({'error': 'start and end must be months in YYYY-MM format'}), 400
+    
+    month_count = (end.year - start.year) * 12 + end.month - start.month + 1
+    if month_count < 1:
+        return jsonify({'error': 'end must not be before start'}), 400
+    if month_count > app.config['CALENDAR_MAX_MONTHS']:
+        return jsonify({'error': f"at most {app.config['CALENDAR_MAX_MONTHS']} months can be requested"}), 400
+    
+    last_day = end.replace(day=calendar.monthrange(end.year, end.month)[1])
+    markers = cycle_index.get_index(session['user_id']).markers(start, last_day)
+    
+    months = []
+    month_start = start
+    for _ in range(month_count):
+        days_in_month = calendar.monthrange(month_start.year, month_start.month)[1]
+        months.append({
+            'month': month_start.strftime('%Y-%m'),
+            'start_day_offset': (month_start.weekday() + 1) % 7,
+            'days_in_month': days_in_month,
+            'days': {
+                day.day: day_markers
+                for day, day_markers in markers.items()
+                if (day.year, day.month) == (month_start.year, month_start.month)
+            }
+        })
+        month_start += timedelta(days=days_in_month)
+    
+    return jsonify({'months': months})
+
 @app.route('/period')
 @login_required
 def period():
@@ -288,7 +329,7 @@ def period():
     cycle_stats = calculate_cycle_stats(user.id)
     
     # Get period history
-    periods = Period.query.filter_by(user_id=user.id).order_by(Period.start_date.desc()).all()
+    periods = read_models.period_rows(user.id)
     
     return render_template('period.html', 
                            user=user, 
@@ -348,23 +389,15 @@ def products():
     user = get_user_data()
     
     # Get products
-    products = Product.query.filter_by(user_id=user.id).all()
+    products = read_models.product_rows(user.id)
     
-    # Get product history
-    history = ProductHistory.query.filter_by(user_id=user.id).order_by(ProductHistory.date.desc()).all()
+    # Get product history grouped by date
+    grouped_history = read_models.group_by_day(read_models.product_history_rows(user.id))
     
-    # Group history by date
-    grouped_history = {}
-    for item in history:
-        date_str = item.date.strftime('%B %d, %Y')
-        if date_str not in grouped_history:
-            grouped_history[date_str] = []
-        grouped_history[date_str].append(item)
-    
-    return render_template('products.html', 
-                           user=user, 
-                           products=products,
-                           grouped_history=grouped_history)
+    return streaming.render_page('products.html', 
+                                 user=user, 
+                                 products=products,
+                                 grouped_history=grouped_history)
 
 @app.route('/add_product', methods=['POST'])
 @login_required
@@ -457,29 +490,21 @@ def medications():
     user = get_user_data()
     
     # Get medications
-    medications = Medication.query.filter_by(user_id=user.id).all()
+    medications = read_models.medication_rows(user.id)
     
-    # Get medication history
-    history = MedicationHistory.query.filter_by(user_id=user.id).order_by(MedicationHistory.date.desc()).all()
-    
-    # Group history by date
-    grouped_history = {}
-    for item in history:
-        date_str = item.date.strftime('%B %d, %Y')
-        if date_str not in grouped_history:
-            grouped_history[date_str] = []
-        grouped_history[date_str].append(item)
+    # Get medication history grouped by date
+    grouped_history = read_models.group_by_day(read_models.medication_history_rows(user.id))
     
     # Group medications by time of day
     morning_meds = [m for m in medications if m.time_of_day == 'morning']
     evening_meds = [m for m in medications if m.time_of_day == 'evening']
     
-    return render_template('medications.html', 
-                           user=user, 
-                           medications=medications,
-                           morning_meds=morning_meds,
-                           evening_meds=evening_meds,
-                           grouped_history=grouped_history)
+    return streaming.render_page('medications.html', 
+                                 user=user, 
+                                 medications=medications,
+                                 morning_meds=morning_meds,
+                                 evening_meds=evening_meds,
+                                 grouped_history=grouped_history)
 
 @app.route('/add_medication', methods=['POST'])
 @login_required
@@ -0,0 +1,77 @@
+# Measures the latency of cheap page loads while a burst of logins is being
+# processed, with password hashing run inline and in the process pool.
+#
+#   python benchmarks/login_storm.py --logins 8 --seconds 5
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import hashing
+from app import app, db
+from models import User
+
+
+def login_worker(stop, counts):
+    client = app.test_client()
+    while not stop.is_set():
+        response = client.post('/login', data={'email': 'bench@example.com', 'password': 'secret'})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+def run(workers, logins, seconds):
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    hashing.init_app(app)
+
+    stop = threading.Event()
+    counts = {}
+    threads = [threading.Thread(target=login_worker, args=(stop, counts)) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+
+    client = app.test_client()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        client.get('/')
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    hashing.shutdown()
+
+    latencies.sort()
+    print(f"workers={workers}: {len(latencies)} page loads, "
+          f"p50={statistics.median(latencies):.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms "
+          f"max={latencies[-1]:.1f}ms, login responses={counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=8, help='concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=app.config['PASSWORD_HASH_WORKERS'])
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        if not User.query.filter_by(email='bench@example.com').first():
+            user = User(name='Bench', email='bench@example.com')
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.commit()
+
+    run(0, args.logins, args.seconds)
+    run(args.workers, args.logins, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Compares loading and grouping history with full ORM entities against the
+# column-only read models used by the list views.
+#
+#   python benchmarks/read_models.py --rows 20000
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import read_models
+from app import app, db
+from models import User, Product, ProductHistory, Medication, MedicationHistory
+
+
+def orm_history(user_id):
+    products = Product.query.filter_by(user_id=user_id).all()
+    history = ProductHistory.query.filter_by(user_id=user_id).order_by(ProductHistory.date.desc()).all()
+    grouped_history = {}
+    for item in history:
+        date_str = item.date.strftime('%B %d, %Y')
+        if date_str not in grouped_history:
+            grouped_history[date_str] = []
+        grouped_history[date_str].append(item)
+    medications = Medication.query.filter_by(user_id=user_id).all()
+    history = MedicationHistory.query.filter_by(user_id=user_id).order_by(MedicationHistory.date.desc()).all()
+    for item in history:
+        grouped_history.setdefault(item.date.strftime('%B %d, %Y'), []).append(item)
+    return products, medications, grouped_history
+
+
+def read_model_history(user_id):
+    products = read_models.product_rows(user_id)
+    grouped_history = read_models.group_by_day(read_models.product_history_rows(user_id))
+    medications = read_models.medication_rows(user_id)
+    grouped_medications = read_models.group_by_day(read_models.medication_history_rows(user_id))
+    return products, medications, grouped_history, grouped_medications
+
+
+def measure(label, fn, user_id, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        start = time.perf_counter()
+        fn(user_id)
+        timings.append(time.perf_counter() - start)
+
+    db.session.remove()
+    tracemalloc.start()
+    result = fn(user_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    print(f"{label:<12} best={min(timings) * 1000:8.1f}ms peak={peak / 1024 / 1024:7.2f}MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000, help='history rows per table')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        user = User(name='Bench', email='bench@example.com', password='-')
+        db.session.add(user)
+        db.session.flush()
+        product = Product(user_id=user.id, name='Pads', category='pads', quantity=10, initial_quantity=40)
+        medication = Medication(user_id=user.id, name='Iron', dosage='1 tablet', frequency='daily',
+                                time_of_day='morning', quantity=10, initial_quantity=30, next_dose=datetime.now())
+        db.session.add_all([product, medication])
+        db.session.flush()
+
+        start = datetime.now() - timedelta(hours=args.rows)
+        db.session.execute(ProductHistory.__table__.insert(), [
+            {'user_id': user.id, 'product_id': product.id, 'product_name': product.name,
+             'date': start + timedelta(hours=i)} for i in range(args.rows)
+        ])
+        db.session.execute(MedicationHistory.__table__.insert(), [
+            {'user_id': user.id, 'medication_id': medication.id, 'medication_name': medication.name,
+             'dosage': medication.dosage, 'date': start + timedelta(hours=i)} for i in range(args.rows)
+        ])
+        db.session.commit()
+        user_id = user.id
+
+        print(f"{args.rows} product and {args.rows} medication history rows")
+        measure('orm', orm_history, user_id, args.repeat)
+        measure('read models', read_model_history, user_id, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,4 +10,43 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     
     # Set this to the static IP address of your NodeMCU
-    NODEMCU_IP = os.environ.get('NODEMCU_IP') or '192.168.29.170'
\ No newline at end of file
+    NODEMCU_IP = os.environ.get('NODEMCU_IP') or '192.168.29.170'
+    
+    # Password hashing runs in a separate process pool so PBKDF2 does not hold
+    # the GIL of the request worker. Set the workers to 0 to hash inline.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 8)
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 5)
+    
+    # Per-request profiling. Requests sending PROFILE_HEADER with the admin
+    # token, or picked by the sample rate, are profiled and written to
+    # PROFILE_DIR (defaults to instance/profiles). PROFILE_MODE is 'sample'
+    # for stack sampling or 'cprofile' for deterministic profiling.
+    PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN')
+    PROFILE_HEADER = 'X-Profile'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_MODE = os.environ.get('PROFILE_MODE') or 'sample'
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_SAMPLE_INTERVAL = 0.001
+    PROFILE_TOP_FUNCTIONS = 30
+    
+    # /api/calendar markers are served from a per-user day index cached in
+    # each worker process. Changes committed in the same process are applied
+    # immediately, but with several worker processes a change made in another
+    # one only shows up once the cached index expires after
+    # CALENDAR_INDEX_TTL seconds. The dashboard month view does not use the
+    # cache, so it always agrees with the cycle stats shown next to it.
+    CALENDAR_MAX_MONTHS = 24
+    CALENDAR_INDEX_TTL = int(os.environ.get('CALENDAR_INDEX_TTL') or 300)
+    CALENDAR_INDEX_MAX_USERS = 1000
+    
+    # History-heavy pages are rendered as a stream, buffered into chunks of
+    # STREAM_BUFFER_SIZE bytes. Responses are gzip compressed when the client
+    # accepts it; non-streamed bodies only above COMPRESSION_MIN_SIZE bytes.
+    RESPONSE_STREAMING = (os.environ.get('RESPONSE_STREAMING') or '1') == '1'
+    STREAM_BUFFER_SIZE = 16384
+    RESPONSE_COMPRESSION = (os.environ.get('RESPONSE_COMPRESSION') or '1') == '1'
+    COMPRESSION_LEVEL = 6
+    COMPRESSION_MIN_SIZE = 500
+    COMPRESSION_MIMETYPES = ['text/html', 'application/json', 'text/plain']
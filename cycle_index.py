@@ -0,0 +1,262 @@
+import bisect
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from models import db, Period, ProductHistory, MedicationHistory
+
+DEFAULT_CYCLE_LENGTH = 28
+DEFAULT_PERIOD_LENGTH = 5
+
+# Marker names returned for each calendar day
+PERIOD = 'period'
+PREDICTED_PERIOD = 'predicted_period'
+FERTILE = 'fertile'
+OVULATION = 'ovulation'
+DOSE_TAKEN = 'dose_taken'
+PRODUCT_USED = 'product_used'
+
+
+def average_cycle_length(start_dates):
+    # start_dates must be sorted newest first
+    if len(start_dates) < 2:
+        return DEFAULT_CYCLE_LENGTH
+    cycle_lengths = [(start_dates[i] - start_dates[i + 1]).days for i in range(len(start_dates) - 1)]
+    avg_length = sum(cycle_lengths) // len(cycle_lengths)
+    # Periods logged on the same day give a zero length cycle
+    if avg_length < 1:
+        return DEFAULT_CYCLE_LENGTH
+    return avg_length
+
+
+class CycleIndex:
+    # A cached index is shared by request threads and never changed in place.
+    # Commits apply their changes to a copy() which then replaces it.
+
+    def __init__(self, periods, doses, products):
+        # periods are (start_date, end_date, id) tuples kept sorted by start
+        self.periods = sorted(periods)
+        self.doses = Counter(doses)
+        self.products = Counter(products)
+        self._refresh()
+
+    def copy(self):
+        return CycleIndex(self.periods, self.doses, self.products)
+
+    def _refresh(self):
+        self.max_span = max([0] + [(end - start).days for start, end, _ in self.periods])
+        starts = [start for start, _, _ in reversed(self.periods)]
+        self.cycle_length = average_cycle_length(starts)
+        if self.periods:
+            self.period_length = max(1, round(sum((end - start).days + 1 for start, end, _ in self.periods) / len(self.periods)))
+        else:
+            self.period_length = DEFAULT_PERIOD_LENGTH
+
+    def add_period(self, period_id, start_date, end_date):
+        self.remove_period(period_id, refresh=False)
+        bisect.insort(self.periods, (start_date, end_date, period_id))
+        self._refresh()
+
+    def remove_period(self, period_id, refresh=True):
+        self.periods = [p for p in self.periods if p[2] != period_id]
+        if refresh:
+            self._refresh()
+
+    def add_dose(self, day, count=1):
+        self._adjust(self.doses, day, count)
+
+    def add_product_use(self, day, count=1):
+        self._adjust(self.products, day, count)
+
+    def _adjust(self, counter, day, count):
+        counter[day] += count
+        if counter[day] <= 0:
+            del counter[day]
+
+    def markers(self, first_day, last_day):
+        days = {}
+
+        def mark(day, marker):
+            # Overlapping periods (or predictions) may mark a day twice
+            if first_day <= day <= last_day:
+                day_markers = days.setdefault(day, [])
+                if marker not in day_markers:
+                    day_markers.append(marker)
+
+        # Logged periods overlapping the range
+        i = bisect.bisect_left(self.periods, (first_day - timedelta(days=self.max_span),))
+        while i < len(self.periods) and self.periods[i][0] <= last_day:
+            start, end, _ = self.periods[i]
+            day = max(start, first_day)
+            while day <= min(end, last_day):
+                mark(day, PERIOD)
+                day += timedelta(days=1)
+            i += 1
+
+        # Predicted cycles following the most recent logged period
+        if self.periods:
+            last_start = self.periods[-1][0]
+            cycle = timedelta(days=self.cycle_length)
+            k = max(0, (first_day - last_start).days // self.cycle_length - 1)
+            while True:
+                next_period = last_start + cycle * (k + 1)
+                ovulation_day = next_period - timedelta(days=14)
+                fertility_start = ovulation_day - timedelta(days=5)
+                if fertility_start > last_day:
+                    break
+                for offset in range(7):
+                    mark(fertility_start + timedelta(days=offset), FERTILE)
+                mark(ovulation_day, OVULATION)
+                for offset in range(self.period_length):
+                    mark(next_period + timedelta(days=offset), PREDICTED_PERIOD)
+                k += 1
+
+        day = first_day
+        while day <= last_day:
+            if day in self.doses:
+                mark(day, DOSE_TAKEN)
+            if day in self.products:
+                mark(day, PRODUCT_USED)
+            day += timedelta(days=1)
+
+        return days
+
+
+# Per-process cache of user indexes. Entries are kept current by the commit
+# hooks below and expire after CALENDAR_INDEX_TTL so that changes committed
+# by other worker processes are eventually picked up.
+_config = {
+    'ttl': 300,
+    'max_users': 1000,
+}
+_indexes = OrderedDict()
+_generations = Counter()
+_lock = threading.Lock()
+
+
+def init_app(app):
+    _config['ttl'] = app.config.get('CALENDAR_INDEX_TTL', _config['ttl'])
+    _config['max_users'] = app.config.get('CALENDAR_INDEX_MAX_USERS', _config['max_users'])
+
+
+def build_index(user_id, history=True):
+    periods = db.session.execute(
+        select(Period.start_date, Period.end_date, Period.id).where(Period.user_id == user_id)
+    ).all()
+    if not history:
+        return CycleIndex([tuple(p) for p in periods], {}, {})
+
+    doses = db.session.execute(
+        select(func.date(MedicationHistory.date, type_=db.Date), func.count())
+        .where(MedicationHistory.user_id == user_id)
+        .group_by(func.date(MedicationHistory.date))
+    ).all()
+    products = db.session.execute(
+        select(func.date(ProductHistory.date, type_=db.Date), func.count())
+        .where(ProductHistory.user_id == user_id)
+        .group_by(func.date(ProductHistory.date))
+    ).all()
+    return CycleIndex([tuple(p) for p in periods], dict(doses), dict(products))
+
+
+def get_index(user_id):
+    with _lock:
+        entry = _indexes.get(user_id)
+        if entry and time.monotonic() - entry[0] < _config['ttl']:
+            _indexes.move_to_end(user_id)
+            return entry[1]
+        generation = _generations[user_id]
+
+    built_at = time.monotonic()
+    index = build_index(user_id)
+
+    with _lock:
+        # Only cache the index if no commit touched this user while building
+        if _generations[user_id] == generation:
+            _indexes[user_id] = (built_at, index)
+            _indexes.move_to_end(user_id)
+            while len(_indexes) > _config['max_users']:
+                _indexes.popitem(last=False)
+    return index
+
+
+def invalidate(user_id=None):
+    with _lock:
+        if user_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(user_id, None)
+            _generations[user_id] += 1
+
+
+def _apply(change, updated):
+    # `updated` maps each user touched by the commit to its new index, or to
+    # None when the user's cached index should be dropped.
+    action, user_id, args = change
+    _generations[user_id] += 1
+    if user_id in updated:
+        index = updated[user_id]
+    else:
+        entry = _indexes.get(user_id)
+        index = updated[user_id] = entry[1].copy() if entry else None
+    if index is None:
+        return
+    if action == 'add_period':
+        index.add_period(*args)
+    elif action == 'remove_period':
+        index.remove_period(*args)
+    elif action == 'dose':
+        index.add_dose(*args)
+    elif action == 'product':
+        index.add_product_use(*args)
+    else:
+        updated[user_id] = None
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    # Changes are collected on flush and only applied once the transaction
+    # commits, so a rollback never leaks into the index.
+    changes = session.info.setdefault('cycle_index_changes', [])
+    for obj in session.new:
+        if isinstance(obj, Period):
+            changes.append(('add_period', obj.user_id, (obj.id, obj.start_date, obj.end_date)))
+        elif isinstance(obj, MedicationHistory):
+            changes.append(('dose', obj.user_id, (obj.date.date(), 1)))
+        elif isinstance(obj, ProductHistory):
+            changes.append(('product', obj.user_id, (obj.date.date(), 1)))
+    for obj in session.dirty:
+        if isinstance(obj, Period):
+            changes.append(('add_period', obj.user_id, (obj.id, obj.start_date, obj.end_date)))
+        elif isinstance(obj, (MedicationHistory, ProductHistory)):
+            changes.append(('rebuild', obj.user_id, ()))
+    for obj in session.deleted:
+        if isinstance(obj, Period):
+            changes.append(('remove_period', obj.user_id, (obj.id,)))
+        elif isinstance(obj, MedicationHistory):
+            changes.append(('dose', obj.user_id, (obj.date.date(), -1)))
+        elif isinstance(obj, ProductHistory):
+            changes.append(('product', obj.user_id, (obj.date.date(), -1)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('cycle_index_changes', None)
+    if not changes:
+        return
+    with _lock:
+        updated = {}
+        for change in changes:
+            _apply(change, updated)
+        for user_id, index in updated.items():
+            if index is None:
+                _indexes.pop(user_id, None)
+            else:
+                _indexes[user_id] = (_indexes[user_id][0], index)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('cycle_index_changes', None)
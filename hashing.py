@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashPoolSaturated(Exception):
+    pass
+
+
+# Module level state, configured from the app config by init_app()
+_config = {
+    'workers': 0,
+    'max_pending': 0,
+    'timeout': None,
+    'method': 'pbkdf2:sha256:600000',
+}
+_executor = None
+_slots = None
+_lock = threading.Lock()
+_prefixes = {}
+
+
+def init_app(app):
+    _config['workers'] = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    _config['max_pending'] = app.config.get('PASSWORD_HASH_MAX_PENDING', 0)
+    _config['timeout'] = app.config.get('PASSWORD_HASH_TIMEOUT')
+    _config['method'] = app.config.get('PASSWORD_HASH_METHOD', _config['method'])
+    shutdown()
+
+
+def shutdown():
+    global _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _slots = None
+
+
+def _get_executor():
+    # The pool is created lazily so that forking servers (gunicorn --preload)
+    # start their hashing processes after the worker fork, not before it. The
+    # children are started from a forkserver (or spawned where that is not
+    # available) rather than forked from this multithreaded process, so they
+    # never inherit locks held by other threads.
+    #
+    # Both start methods re-import __main__ in the pool processes. With
+    # `python app.py` that re-runs app.py's module-level setup there, and a
+    # script without an `if __name__ == '__main__':` guard around its work
+    # will make the pool fail with BrokenProcessPool.
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = _config['workers']
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(_start_method())
+            )
+            _slots = threading.BoundedSemaphore(workers + max(0, _config['max_pending']))
+        return _executor, _slots
+
+
+def _start_method():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+def _run(fn, *args):
+    if _config['workers'] <= 0:
+        return fn(*args)
+
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise HashPoolSaturated()
+
+    # The slot is freed by whichever comes first: this thread once it has the
+    # result, or the done callback for jobs that outlive the timeout.
+    released = threading.Lock()
+
+    def release(_=None):
+        if released.acquire(blocking=False):
+            slots.release()
+
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        release()
+        raise
+    future.add_done_callback(release)
+
+    try:
+        result = future.result(timeout=_config['timeout'])
+    except FutureTimeoutError:
+        future.cancel()
+        raise HashPoolSaturated()
+    release()
+    return result
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, _config['method'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def _method_prefix(method):
+    # Werkzeug expands short names ('pbkdf2', 'scrypt') to the full method
+    # with its parameters, so take the prefix from a real hash, once per method.
+    if method not in _prefixes:
+        _prefixes[method] = generate_password_hash('x', method).split('$', 1)[0]
+    return _prefixes[method]
+
+
+def needs_rehash(pwhash):
+    # Werkzeug hashes look like "method$salt$hash", so comparing the method
+    # prefix is enough to tell whether the configured cost has changed.
+    return pwhash.split('$', 1)[0] != _method_prefix(_config['method'])
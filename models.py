@@ -1,6 +1,6 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+import hashing
 
 db = SQLAlchemy()
 
@@ -15,10 +15,13 @@ class User(db.Model):
     settings = db.relationship('UserSettings', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = hashing.hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return hashing.verify_password(self.password, password)
+    
+    def password_needs_rehash(self):
+        return hashing.needs_rehash(self.password)
 
 class UserSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
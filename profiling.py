@@ -0,0 +1,178 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import g, request
+
+# Opt-in per-request profiling. A request is profiled when it carries the
+# admin header with the configured token, or when it is picked by the
+# sampling rate. Nothing is registered on the app when both are disabled.
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.elapsed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+
+        # The sampler thread needs the GIL to wake up, so the real interval is
+        # usually much longer than the configured one. Report what was measured.
+        samples = sum(self.stacks.values())
+        if not samples:
+            return (f"0 samples over {self.elapsed * 1000:.1f}ms (requested every {self.interval * 1000:g}ms)\n\n"
+                    "No samples were taken; the request finished before the sampler woke up.\n")
+
+        lines = [f"{samples} samples over {self.elapsed * 1000:.1f}ms, one every "
+                 f"{self.elapsed * 1000 / samples:.2f}ms (requested {self.interval * 1000:g}ms)", '',
+                 f"{'own':>7} {'total':>7}  function"]
+        for frame, count in own.most_common(limit):
+            lines.append(f"{count / samples:7.1%} {total[frame] / samples:7.1%}  {frame}")
+        return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    token = app.config.get('PROFILE_ADMIN_TOKEN')
+    rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    if not token and rate <= 0:
+        return
+
+    header = app.config.get('PROFILE_HEADER', 'X-Profile')
+    mode = app.config.get('PROFILE_MODE', 'sample')
+    output_dir = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    interval = app.config.get('PROFILE_SAMPLE_INTERVAL', 0.001)
+    limit = app.config.get('PROFILE_TOP_FUNCTIONS', 30)
+
+    def finish(capture):
+        profiler = capture.pop('profiler', None)
+        if profiler is None:
+            return
+
+        elapsed = time.perf_counter() - capture['started']
+        name = capture['name']
+        os.makedirs(output_dir, exist_ok=True)
+        if mode == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(os.path.join(output_dir, name + '.prof'))
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+            summary = stream.getvalue()
+            collapsed = _collapse_cprofile(profiler)
+        else:
+            profiler.stop()
+            summary = profiler.summary(limit)
+            collapsed = profiler.collapsed()
+
+        with open(os.path.join(output_dir, name + '.collapsed'), 'w') as f:
+            f.write(collapsed)
+        with open(os.path.join(output_dir, name + '.txt'), 'w') as f:
+            f.write(f"{capture['request_line']} {capture.get('status', 500)} in {elapsed * 1000:.1f}ms\n\n" + summary)
+
+    @app.before_request
+    def start_profiling():
+        supplied = request.headers.get(header)
+        requested = bool(token) and supplied is not None and hmac.compare_digest(supplied.encode(), token.encode())
+        if not requested and random.random() >= rate:
+            return
+
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), interval)
+            profiler.start()
+        g.profile = {
+            'profiler': profiler,
+            'started': time.perf_counter(),
+            'name': f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{os.getpid()}-{uuid.uuid4().hex[:8]}",
+            'request_line': f"{request.method} {request.full_path.rstrip('?')}",
+        }
+
+    @app.after_request
+    def tag_response(response):
+        capture = g.get('profile')
+        if capture is None:
+            return response
+
+        capture['status'] = response.status_code
+        response.headers['X-Profile-Id'] = capture['name']
+        # Streamed bodies are still being rendered when this hook returns,
+        # so keep profiling until the server closes the response.
+        if response.is_streamed:
+            capture['on_close'] = True
+            response.call_on_close(lambda: finish(capture))
+        return response
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        # Teardown runs even when an exception skips after_request, so the
+        # profiler is always stopped here unless the response will do it.
+        capture = g.pop('profile', None)
+        if capture is None or (capture.get('on_close') and exc is None):
+            return
+        finish(capture)
+
+
+def _collapse_cprofile(profiler):
+    # cProfile only records caller/callee pairs, so the best collapsed form it
+    # can give is a two-level stack weighted by the time spent in each call.
+    stats = pstats.Stats(profiler).stats
+    lines = []
+    for func, (_, _, tottime, _, callers) in stats.items():
+        name = _format_func(func)
+        if not callers:
+            lines.append(f"{name} {int(tottime * 1e6)}")
+        for caller, (_, _, caller_tottime, _) in callers.items():
+            weight = int(caller_tottime * 1e6)
+            if weight:
+                lines.append(f"{_format_func(caller)};{name} {weight}")
+    return '\n'.join(lines) + '\n'
+
+
+def _format_func(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
@@ -0,0 +1,128 @@
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import case, select
+from models import db, Period, Product, ProductHistory, Medication, MedicationHistory
+
+# Read-only rows for list and history views. They are plain tuples built from
+# column queries, so no ORM instances are created or tracked by the session.
+
+STATUS_CLASSES = {
+    'Out of Stock': 'status-error',
+    'Running Low': 'status-warning',
+    'Stocked': 'status-success',
+}
+
+
+class ProductRow(namedtuple('ProductRow', 'id name category quantity initial_quantity status')):
+    __slots__ = ()
+
+    @property
+    def status_class(self):
+        return STATUS_CLASSES[self.status]
+
+
+MedicationRow = namedtuple('MedicationRow', 'id name dosage frequency time_of_day quantity initial_quantity next_dose')
+UpcomingMedicationRow = namedtuple('UpcomingMedicationRow', MedicationRow._fields + ('time_until',))
+PeriodRow = namedtuple('PeriodRow', 'id start_date end_date notes')
+ProductHistoryRow = namedtuple('ProductHistoryRow', 'product_name date')
+MedicationHistoryRow = namedtuple('MedicationHistoryRow', 'medication_name dosage date')
+
+_MEDICATION_COLUMNS = (
+    Medication.id,
+    Medication.name,
+    Medication.dosage,
+    Medication.frequency,
+    Medication.time_of_day,
+    Medication.quantity,
+    Medication.initial_quantity,
+    Medication.next_dose,
+)
+
+
+def _rows(row_type, stmt):
+    return [row_type._make(row) for row in db.session.execute(stmt)]
+
+
+def product_rows(user_id):
+    # Less than a quarter of the initial quantity counts as running low
+    initial_qty = case((Product.initial_quantity > 0, Product.initial_quantity), else_=1)
+    status = case(
+        (Product.quantity <= 0, 'Out of Stock'),
+        (Product.quantity * 4 < initial_qty, 'Running Low'),
+        else_='Stocked'
+    )
+    return _rows(ProductRow, select(
+        Product.id,
+        Product.name,
+        Product.category,
+        Product.quantity,
+        Product.initial_quantity,
+        status
+    ).where(Product.user_id == user_id))
+
+
+def medication_rows(user_id):
+    return _rows(MedicationRow, select(*_MEDICATION_COLUMNS).where(Medication.user_id == user_id))
+
+
+def upcoming_medication_rows(user_id, now, limit=3):
+    stmt = (
+        select(*_MEDICATION_COLUMNS)
+        .where(Medication.user_id == user_id, Medication.next_dose >= now - timedelta(minutes=30))
+        .order_by(Medication.next_dose)
+        .limit(limit)
+    )
+    rows = []
+    for row in db.session.execute(stmt):
+        time_diff = row.next_dose - now
+        if time_diff.total_seconds() < 0:
+            time_until = "Due now"
+        else:
+            hours, remainder = divmod(time_diff.seconds, 3600)
+            minutes, _ = divmod(remainder, 60)
+            time_until = f"{hours} hours {minutes} minutes"
+        rows.append(UpcomingMedicationRow(*row, time_until))
+    return rows
+
+
+def period_rows(user_id):
+    return _rows(PeriodRow, select(
+        Period.id,
+        Period.start_date,
+        Period.end_date,
+        Period.notes
+    ).where(Period.user_id == user_id).order_by(Period.start_date.desc()))
+
+
+def period_start_dates(user_id):
+    return db.session.scalars(
+        select(Period.start_date).where(Period.user_id == user_id).order_by(Period.start_date.desc())
+    ).all()
+
+
+def product_history_rows(user_id):
+    return _rows(ProductHistoryRow, select(
+        ProductHistory.product_name,
+        ProductHistory.date
+    ).where(ProductHistory.user_id == user_id).order_by(ProductHistory.date.desc()))
+
+
+def medication_history_rows(user_id):
+    return _rows(MedicationHistoryRow, select(
+        MedicationHistory.medication_name,
+        MedicationHistory.dosage,
+        MedicationHistory.date
+    ).where(MedicationHistory.user_id == user_id).order_by(MedicationHistory.date.desc()))
+
+
+def group_by_day(rows):
+    # Rows are ordered by date, so each day's rows are contiguous
+    grouped_history = {}
+    current_day = None
+    for item in rows:
+        day = item.date.date()
+        if day != current_day:
+            current_day = day
+            items = grouped_history.setdefault(item.date.strftime('%B %d, %Y'), [])
+        items.append(item)
+    return grouped_history
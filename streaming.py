@@ -0,0 +1,96 @@
+import gzip
+import zlib
+from flask import Response, current_app, get_flashed_messages, render_template, request, stream_template
+
+# Streamed template rendering and negotiated gzip compression. Streamed
+# bodies are compressed chunk by chunk, so a page is never held in memory
+# in full, either rendered or compressed.
+
+
+def render_page(template_name, **context):
+    if not current_app.config.get('RESPONSE_STREAMING', False):
+        return render_template(template_name, **context)
+
+    # The session is saved before a streamed body is rendered, so pop any
+    # flashed messages now. The template reads them from the request cache.
+    get_flashed_messages(with_categories=True)
+
+    chunks = stream_template(template_name, **context)
+    return Response(_coalesce(chunks, current_app.config.get('STREAM_BUFFER_SIZE', 16384)), mimetype='text/html')
+
+
+def init_app(app):
+    if not app.config.get('RESPONSE_COMPRESSION', False):
+        return
+
+    level = app.config.get('COMPRESSION_LEVEL', 6)
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 500)
+    mimetypes = set(app.config.get('COMPRESSION_MIMETYPES', ['text/html', 'application/json']))
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if (
+            not request.accept_encodings['gzip']
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+        ):
+            return response
+
+        if response.is_streamed:
+            response.response = _gzip_stream(response.response, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(gzip.compress(data, level))
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+
+def _coalesce(chunks, size):
+    # Jinja yields many tiny strings; join them into buffers of about `size`
+    # bytes so each write to the client (and each gzip flush) is worthwhile.
+    buffer = []
+    buffered = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= size:
+                yield b''.join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield b''.join(buffer)
+    finally:
+        _close(chunks)
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            # Sync flush so the client can start rendering each chunk
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        _close(chunks)
+
+
+def _close(chunks):
+    close = getattr(chunks, 'close', None)
+    if close is not None:
+        close()
@@ -0,0 +1,39 @@
+import os
+
+# Never touch the bundled instance database, and hash passwords inline so the
+# tests do not start a process pool.
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+import pytest
+import requests
+import app as app_module
+import cycle_index
+from models import db
+
+
+@pytest.fixture
+def app():
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    cycle_index.invalidate()
+    yield flask_app
+
+
+@pytest.fixture(autouse=True)
+def no_nodemcu(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise requests.ConnectionError('NodeMCU is not reachable from tests')
+    monkeypatch.setattr(app_module.requests, 'get', unreachable)
+
+
+@pytest.fixture
+def user_id(client):
+    client.post('/register', data={'full-name': 'Test User', 'email': 'test@example.com', 'password': 'secret'})
+    # Drop the sign-up flash so page renders do not depend on request order
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+        return session['user_id']
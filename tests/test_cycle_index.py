@@ -0,0 +1,159 @@
+from datetime import date, datetime, timedelta
+import cycle_index
+from app import calculate_cycle_stats
+from cycle_index import CycleIndex
+from models import db, Period, ProductHistory
+
+YEAR_START = date(2026, 1, 1)
+YEAR_END = date(2026, 12, 31)
+
+
+def add_period(client, start, end):
+    client.post('/add_period', data={'start-date': start.isoformat(), 'end-date': end.isoformat()})
+
+
+def assert_cache_matches_fresh_build(user_id, first_day=YEAR_START, last_day=YEAR_END):
+    # The incrementally updated index must still be the cached one, and must
+    # agree with an index built from scratch.
+    assert user_id in cycle_index._indexes
+    cached = cycle_index.get_index(user_id)
+    assert cached is cycle_index._indexes[user_id][1]
+    assert cached.markers(first_day, last_day) == cycle_index.build_index(user_id).markers(first_day, last_day)
+
+
+def test_period_changes_update_cached_index(client, user_id):
+    assert client.get('/api/calendar?start=2026-01&end=2026-12').status_code == 200
+
+    add_period(client, date(2026, 1, 3), date(2026, 1, 7))
+    assert_cache_matches_fresh_build(user_id)
+    add_period(client, date(2026, 1, 31), date(2026, 2, 4))
+    assert_cache_matches_fresh_build(user_id)
+    add_period(client, date(2026, 3, 28), date(2026, 4, 2))
+    assert_cache_matches_fresh_build(user_id)
+
+    # Move a period across a month boundary
+    period = Period.query.filter_by(start_date=date(2026, 3, 28)).first()
+    client.post(f'/update_period/{period.id}', data={'start-date': '2026-04-29', 'end-date': '2026-05-03'})
+    assert_cache_matches_fresh_build(user_id)
+    markers = cycle_index.get_index(user_id).markers(date(2026, 3, 1), date(2026, 5, 31))
+    assert cycle_index.PERIOD not in markers.get(date(2026, 3, 30), [])
+    assert cycle_index.PERIOD in markers[date(2026, 5, 1)]
+
+    client.post(f'/delete_period/{period.id}')
+    assert_cache_matches_fresh_build(user_id)
+
+
+def test_history_changes_update_cached_index(client, user_id):
+    today = datetime.utcnow().date()
+    first_day, last_day = today - timedelta(days=40), today + timedelta(days=40)
+    client.get('/api/calendar')
+
+    client.post('/add_product', data={'name': 'Pads', 'category': 'pads', 'quantity': '5'})
+    client.post('/use_product/1')
+    client.post('/use_product/1')
+    client.post('/add_medication', data={'name': 'Iron', 'dosage': '1 tablet', 'frequency': 'daily',
+                                         'time_of_day': 'morning', 'quantity': '5'})
+    client.post('/take_medication/1')
+    assert_cache_matches_fresh_build(user_id, first_day, last_day)
+    markers = cycle_index.get_index(user_id).markers(first_day, last_day)
+    assert cycle_index.PRODUCT_USED in markers[today]
+    assert cycle_index.DOSE_TAKEN in markers[today]
+
+    # Removing one of the two uses keeps the marker, removing both clears it
+    for expected in (True, False):
+        db.session.delete(ProductHistory.query.first())
+        db.session.commit()
+        assert_cache_matches_fresh_build(user_id, first_day, last_day)
+        markers = cycle_index.get_index(user_id).markers(first_day, last_day)
+        assert (cycle_index.PRODUCT_USED in markers.get(today, [])) is expected
+
+
+def test_commits_replace_the_cached_index_instead_of_changing_it(client, user_id):
+    add_period(client, date(2026, 1, 3), date(2026, 1, 7))
+    held = cycle_index.get_index(user_id)
+    held_markers = held.markers(YEAR_START, YEAR_END)
+
+    add_period(client, date(2026, 2, 1), date(2026, 2, 5))
+
+    # A reader still using the old index sees a consistent, unchanged state
+    assert held.markers(YEAR_START, YEAR_END) == held_markers
+    assert cycle_index.get_index(user_id) is not held
+    assert_cache_matches_fresh_build(user_id)
+
+
+def test_rolled_back_changes_are_not_applied(client, user_id):
+    add_period(client, date(2026, 1, 3), date(2026, 1, 7))
+    before = cycle_index.get_index(user_id)
+
+    db.session.add(Period(user_id=user_id, start_date=date(2026, 6, 1), end_date=date(2026, 6, 5)))
+    db.session.flush()
+    db.session.rollback()
+    # A later commit must not pick up the changes recorded before the rollback
+    db.session.commit()
+
+    assert cycle_index.get_index(user_id) is before
+    assert_cache_matches_fresh_build(user_id)
+
+
+def test_index_is_not_cached_when_a_commit_races_the_build(client, user_id, monkeypatch):
+    build_index = cycle_index.build_index
+
+    def racing_build(uid):
+        index = build_index(uid)
+        cycle_index.invalidate(uid)
+        return index
+
+    monkeypatch.setattr(cycle_index, 'build_index', racing_build)
+    cycle_index.get_index(user_id)
+    assert user_id not in cycle_index._indexes
+
+    monkeypatch.setattr(cycle_index, 'build_index', build_index)
+    cycle_index.get_index(user_id)
+    assert user_id in cycle_index._indexes
+
+
+def test_predictions_far_ahead_match_walking_from_the_last_period():
+    periods = [
+        (date(2026, 1, 2), date(2026, 1, 6), 1),
+        (date(2026, 2, 3), date(2026, 2, 8), 2),
+        (date(2026, 3, 6), date(2026, 3, 9), 3),
+    ]
+    index = CycleIndex(periods, {}, {})
+    assert index.cycle_length == 31
+
+    walk_end = date(2028, 12, 31)
+    walked = index.markers(date(2026, 3, 6), walk_end)
+    for first_day in (date(2026, 3, 20), date(2026, 8, 1), date(2027, 6, 15), date(2028, 11, 30)):
+        last_day = min(first_day + timedelta(days=45), walk_end)
+        expected = {day: markers for day, markers in walked.items() if first_day <= day <= last_day}
+        assert index.markers(first_day, last_day) == expected
+
+
+def test_calendar_api_rejects_bad_ranges(client, user_id):
+    assert client.get('/api/calendar?start=2026-13').status_code == 400
+    assert client.get('/api/calendar?start=2026-05&end=2026-01').status_code == 400
+    assert client.get('/api/calendar?start=2026-01&end=2028-01').status_code == 400
+
+    response = client.get('/api/calendar?start=2026-01&end=2026-03')
+    months = response.get_json()['months']
+    assert [m['month'] for m in months] == ['2026-01', '2026-02', '2026-03']
+    assert [m['days_in_month'] for m in months] == [31, 28, 31]
+
+
+def test_overlapping_periods_mark_each_day_once():
+    index = CycleIndex([
+        (date(2026, 1, 3), date(2026, 1, 7), 1),
+        (date(2026, 1, 5), date(2026, 1, 9), 2),
+    ], {}, {})
+    markers = index.markers(date(2026, 1, 1), date(2026, 1, 31))
+    for day in (date(2026, 1, 5), date(2026, 1, 6), date(2026, 1, 7)):
+        assert markers[day].count(cycle_index.PERIOD) == 1
+    assert all(len(set(day_markers)) == len(day_markers) for day_markers in markers.values())
+
+
+def test_periods_on_the_same_day_fall_back_to_the_default_cycle(client, user_id):
+    add_period(client, date(2026, 1, 3), date(2026, 1, 7))
+    add_period(client, date(2026, 1, 3), date(2026, 1, 6))
+
+    assert cycle_index.get_index(user_id).cycle_length == cycle_index.DEFAULT_CYCLE_LENGTH
+    assert calculate_cycle_stats(user_id)['average_length'] == cycle_index.DEFAULT_CYCLE_LENGTH
@@ -0,0 +1,97 @@
+import time
+import pytest
+import hashing
+from models import User
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setitem(hashing._config, 'workers', 1)
+    monkeypatch.setitem(hashing._config, 'max_pending', 0)
+    hashing.shutdown()
+    yield
+    hashing.shutdown()
+
+
+def login(client):
+    return client.post('/login', data={'email': 'test@example.com', 'password': 'secret'})
+
+
+def stored_hash():
+    return User.query.filter_by(email='test@example.com').first().password
+
+
+def test_pool_hashes_and_frees_its_slot(pool):
+    pwhash = hashing.hash_password('secret')
+    assert hashing.verify_password(pwhash, 'secret')
+    assert not hashing.verify_password(pwhash, 'wrong')
+    _, slots = hashing._get_executor()
+    assert slots.acquire(blocking=False)
+    slots.release()
+
+
+@pytest.mark.parametrize('path', ['/login', '/register'])
+def test_saturated_pool_returns_503(client, user_id, pool, path):
+    # /login hashes for the existing user, /register for the new one
+    _, slots = hashing._get_executor()
+    assert slots.acquire(blocking=False)
+
+    email = 'test@example.com' if path == '/login' else 'other@example.com'
+    response = client.post(path, data={'full-name': 'Other', 'email': email, 'password': 'secret'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert b'The server is busy' in response.data
+
+
+def test_timeout_raises_and_slot_is_freed_when_the_job_ends(pool, monkeypatch):
+    monkeypatch.setitem(hashing._config, 'timeout', 0.05)
+    with pytest.raises(hashing.HashPoolSaturated):
+        hashing._run(time.sleep, 0.5)
+
+    # The job still holds its slot until it actually finishes
+    _, slots = hashing._get_executor()
+    assert not slots.acquire(blocking=False)
+    deadline = time.monotonic() + 10
+    while not slots.acquire(blocking=False):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    slots.release()
+
+
+def test_login_upgrades_hash_when_method_changes(client, user_id, monkeypatch):
+    monkeypatch.setitem(hashing._config, 'method', 'pbkdf2:sha256:1000')
+    assert login(client).status_code == 302
+    assert stored_hash().startswith('pbkdf2:sha256:1000$')
+
+
+@pytest.mark.parametrize('method', ['pbkdf2', 'scrypt'])
+def test_short_method_names_do_not_rehash_every_login(client, user_id, monkeypatch, method):
+    monkeypatch.setitem(hashing._config, 'method', method)
+    login(client)
+    upgraded = stored_hash()
+    assert not hashing.needs_rehash(upgraded)
+
+    def fail(password):
+        raise AssertionError('password was hashed again')
+    monkeypatch.setattr(hashing, 'hash_password', fail)
+    assert login(client).status_code == 302
+    assert stored_hash() == upgraded
+
+
+def test_busy_pool_during_upgrade_does_not_fail_login(client, user_id, monkeypatch):
+    original = stored_hash()
+    monkeypatch.setitem(hashing._config, 'method', 'pbkdf2:sha256:1000')
+
+    def busy(password):
+        raise hashing.HashPoolSaturated()
+    monkeypatch.setattr(hashing, 'hash_password', busy)
+
+    response = login(client)
+    assert response.status_code == 302
+    assert response.location.endswith('/dashboard')
+    assert stored_hash() == original
+
+
+def test_falls_back_to_spawn_without_forkserver(monkeypatch):
+    monkeypatch.setattr(hashing.multiprocessing, 'get_all_start_methods', lambda: ['spawn'])
+    assert hashing._start_method() == 'spawn'
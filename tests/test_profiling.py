@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+import pytest
+from flask import Flask, Response
+import profiling
+
+TOKEN = 'let-me-profile'
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def make_app(profile_dir, mode, **config):
+    flask_app = Flask(__name__)
+    flask_app.config.update(TESTING=True, PROFILE_ADMIN_TOKEN=TOKEN, PROFILE_DIR=str(profile_dir),
+                            PROFILE_MODE=mode, **config)
+    profiling.init_app(flask_app)
+
+    @flask_app.route('/work')
+    def work():
+        busy(0.1)
+        return 'done'
+
+    @flask_app.route('/boom')
+    def boom():
+        busy(0.02)
+        raise RuntimeError('boom')
+
+    @flask_app.route('/stream')
+    def stream():
+        def generate():
+            yield 'start'
+            busy(0.1)
+            yield 'end'
+        return Response(generate())
+
+    return flask_app
+
+
+@pytest.fixture(params=['sample', 'cprofile'])
+def mode(request):
+    return request.param
+
+
+@pytest.fixture
+def profiled(tmp_path, mode):
+    return make_app(tmp_path, mode).test_client()
+
+
+def capture_files(profile_dir, name):
+    with open(os.path.join(profile_dir, name + '.txt')) as f:
+        summary = f.read()
+    with open(os.path.join(profile_dir, name + '.collapsed')) as f:
+        collapsed = f.read()
+    return summary, collapsed
+
+
+def test_nothing_is_registered_when_disabled(tmp_path):
+    flask_app = Flask(__name__)
+    profiling.init_app(flask_app)
+    assert not flask_app.before_request_funcs and not flask_app.teardown_request_funcs
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Profile': 'wrong'}, {'X-Profile': TOKEN + 'x'}])
+def test_requests_without_the_token_are_not_profiled(profiled, tmp_path, headers):
+    response = profiled.get('/work', headers=headers)
+    assert 'X-Profile-Id' not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_token_request_writes_capture(profiled, tmp_path, mode):
+    response = profiled.get('/work?x=1', headers={'X-Profile': TOKEN})
+    name = response.headers['X-Profile-Id']
+    assert '-work-' in name
+
+    summary, collapsed = capture_files(tmp_path, name)
+    assert summary.startswith('GET /work?x=1 200 in ')
+    assert 'busy' in summary
+    assert 'busy' in collapsed
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert stack and int(count) >= 0
+    assert os.path.exists(os.path.join(tmp_path, name + '.prof')) == (mode == 'cprofile')
+
+
+def test_sample_rate_profiles_without_token(tmp_path, mode):
+    client = make_app(tmp_path, mode, PROFILE_SAMPLE_RATE=1.0).test_client()
+    assert 'X-Profile-Id' in client.get('/work').headers
+
+
+def test_captures_in_the_same_second_get_unique_names(profiled, tmp_path):
+    names = {profiled.get('/work', headers={'X-Profile': TOKEN}).headers['X-Profile-Id'] for _ in range(3)}
+    assert len(names) == 3
+    assert len([f for f in os.listdir(tmp_path) if f.endswith('.txt')]) == 3
+
+
+def test_profiler_is_stopped_when_the_view_raises(profiled, tmp_path):
+    threads = threading.active_count()
+    with pytest.raises(RuntimeError):
+        profiled.get('/boom', headers={'X-Profile': TOKEN})
+
+    assert threading.active_count() == threads
+    assert sys.getprofile() is None
+    [summary_file] = [f for f in os.listdir(tmp_path) if f.endswith('.txt')]
+    with open(os.path.join(tmp_path, summary_file)) as f:
+        assert f.read().startswith('GET /boom 500 in ')
+
+
+def test_streamed_response_is_captured_when_closed(profiled, tmp_path):
+    response = profiled.get('/stream', headers={'X-Profile': TOKEN}, buffered=False)
+    name = response.headers['X-Profile-Id']
+    assert os.listdir(tmp_path) == []
+
+    assert response.get_data() == b'startend'
+    response.close()
+    summary, collapsed = capture_files(tmp_path, name)
+    elapsed = float(summary.split(' in ', 1)[1].split('ms', 1)[0])
+    assert elapsed >= 100
+    assert 'busy' in collapsed
+
+
+def test_summary_without_samples():
+    sampler = profiling.StackSampler(threading.get_ident(), 0.001)
+    sampler.elapsed = 0.0004
+    summary = sampler.summary(10)
+    assert summary.startswith('0 samples over 0.4ms')
+    assert 'No samples were taken' in summary
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+import read_models
+from models import db, Product, ProductHistory
+
+
+def python_status(quantity, initial_quantity):
+    # The stock status rules as they were computed per ORM object in the view
+    initial_qty = initial_quantity if initial_quantity > 0 else 1
+    if quantity <= 0:
+        return 'Out of Stock', 'status-error'
+    elif quantity < (initial_qty * 0.25):
+        return 'Running Low', 'status-warning'
+    return 'Stocked', 'status-success'
+
+
+def python_group_by_day(rows):
+    grouped_history = {}
+    for item in rows:
+        date_str = item.date.strftime('%B %d, %Y')
+        if date_str not in grouped_history:
+            grouped_history[date_str] = []
+        grouped_history[date_str].append(item)
+    return grouped_history
+
+
+@pytest.mark.parametrize('quantity, initial_quantity, expected', [
+    (0, 20, 'Out of Stock'),
+    (-1, 20, 'Out of Stock'),
+    (0, 0, 'Out of Stock'),
+    (1, 0, 'Stocked'),
+    (3, 0, 'Stocked'),
+    (5, 20, 'Stocked'),
+    (4, 20, 'Running Low'),
+    (1, 5, 'Running Low'),
+    (2, 5, 'Stocked'),
+    (1, 1, 'Stocked'),
+    (30, 20, 'Stocked'),
+])
+def test_product_status_matches_the_python_rules(app, user_id, quantity, initial_quantity, expected):
+    db.session.add(Product(user_id=user_id, name='Pads', category='pads',
+                           quantity=quantity, initial_quantity=initial_quantity))
+    db.session.commit()
+
+    [row] = read_models.product_rows(user_id)
+    assert row.status == expected
+    assert (row.status, row.status_class) == python_status(quantity, initial_quantity)
+
+
+def test_group_by_day_matches_the_python_grouping(app, user_id):
+    product = Product(user_id=user_id, name='Pads', category='pads', quantity=5, initial_quantity=5)
+    db.session.add(product)
+    db.session.flush()
+    start = datetime(2026, 3, 30, 23, 30)
+    for minutes in (0, 10, 45, 60 * 24, 60 * 24 * 3, 60 * 24 * 3 + 1, 60 * 24 * 400):
+        db.session.add(ProductHistory(user_id=user_id, product_id=product.id, product_name='Pads',
+                                      date=start + timedelta(minutes=minutes)))
+    db.session.commit()
+
+    rows = read_models.product_history_rows(user_id)
+    grouped = read_models.group_by_day(rows)
+    assert grouped == python_group_by_day(rows)
+    assert list(grouped) == list(python_group_by_day(rows))
+    assert [len(items) for items in grouped.values()] == [1, 2, 2, 2]
@@ -0,0 +1,68 @@
+import gzip
+from datetime import datetime, timedelta
+import pytest
+from models import db, ProductHistory, MedicationHistory
+
+
+@pytest.fixture
+def history(client, user_id):
+    client.post('/add_product', data={'name': 'Pads', 'category': 'pads', 'quantity': '40'})
+    client.post('/add_medication', data={'name': 'Iron', 'dosage': '1 tablet', 'frequency': 'daily',
+                                         'time_of_day': 'morning', 'quantity': '30'})
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+
+    # Enough rows for the pages to be streamed in several chunks
+    start = datetime(2026, 1, 1, 8, 0)
+    for i in range(300):
+        db.session.add(ProductHistory(user_id=user_id, product_id=1, product_name='Pads',
+                                      date=start + timedelta(hours=7 * i)))
+        db.session.add(MedicationHistory(user_id=user_id, medication_id=1, medication_name='Iron',
+                                         dosage='1 tablet', date=start + timedelta(hours=5 * i)))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('path', ['/products', '/medications'])
+def test_gzip_stream_is_byte_identical_to_buffered_render(app, client, history, monkeypatch, path):
+    monkeypatch.setitem(app.config, 'RESPONSE_STREAMING', False)
+    buffered = client.get(path)
+    assert buffered.status_code == 200
+
+    monkeypatch.setitem(app.config, 'RESPONSE_STREAMING', True)
+    streamed = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert streamed.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in streamed.headers
+    assert len(streamed.data) < len(buffered.data)
+    assert gzip.decompress(streamed.data) == buffered.data
+
+
+@pytest.mark.parametrize('accept_encoding', [None, 'identity', 'gzip;q=0'])
+def test_no_compression_unless_client_accepts_gzip(client, history, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = client.get('/products', headers=headers)
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.startswith(b'<!DOCTYPE html>')
+
+
+def test_small_buffered_body_is_not_compressed(app, client, user_id):
+    response = client.get('/api/calendar', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < app.config['COMPRESSION_MIN_SIZE']
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+
+@pytest.mark.parametrize('path', ['/products', '/medications', '/dashboard'])
+def test_vary_accept_encoding(client, user_id, path):
+    for headers in ({}, {'Accept-Encoding': 'gzip'}):
+        assert 'Accept-Encoding' in client.get(path, headers=headers).vary
+
+
+def test_flash_on_streamed_page_is_shown_once(app, client, user_id, monkeypatch):
+    monkeypatch.setitem(app.config, 'RESPONSE_STREAMING', True)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Flashed before streaming')]
+
+    assert b'Flashed before streaming' in client.get('/products').data
+    with client.session_transaction() as session:
+        assert '_flashes' not in session
+    assert b'Flashed before streaming' not in client.get('/products').data